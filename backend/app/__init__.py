@@ -22,6 +22,14 @@ def create_app(config_name=None):
     # Initialize extensions
     CORS(app, origins=app.config['CORS_ORIGINS'])
     
+    # Shared services, built here rather than on first request so that with
+    # gunicorn's preload_app their read-only data is shared by forked workers
+    from app.services.vehicle_detector import load_vehicle_cascade
+    from app.services.traffic_analyzer import TrafficAnalyzer
+    
+    load_vehicle_cascade()
+    app.extensions['traffic_analyzer'] = TrafficAnalyzer(app.config)
+    
     # Register blueprints
     from app.routes.health_routes import health_bp
     from app.routes.traffic_routes import traffic_bp
@@ -1,5 +1,7 @@
 from flask import Blueprint, jsonify
+import functools
 import logging
+import time
 from datetime import datetime
 import psutil
 import os
@@ -9,6 +11,35 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 health_bp = Blueprint('health', __name__)
 
+# Prime psutil's CPU counters so non-blocking reads return a real value
+psutil.cpu_percent(interval=None)
+
+def ttl_cache(seconds):
+    """Cache a zero-argument function's result for the given number of seconds"""
+    def decorator(func):
+        cached = {'value': None, 'expires': 0.0}
+        
+        @functools.wraps(func)
+        def wrapper():
+            now = time.monotonic()
+            if now >= cached['expires']:
+                cached['value'] = func()
+                cached['expires'] = now + seconds
+            return cached['value']
+        
+        return wrapper
+    return decorator
+
+@ttl_cache(10)
+def _disk_usage_percent():
+    """Disk usage of the root filesystem (statvfs syscall)"""
+    return psutil.disk_usage('/').percent
+
+@ttl_cache(10)
+def _active_connections():
+    """Number of open sockets on the host (walks /proc/net on Linux)"""
+    return len(psutil.net_connections())
+
 @health_bp.route('/api/health', methods=['GET'])
 def health_check():
     """Comprehensive health check endpoint"""
@@ -23,10 +54,10 @@ def health_check():
         
         # System metrics
         system_metrics = {
-            'cpu_percent': psutil.cpu_percent(interval=1),
+            'cpu_percent': psutil.cpu_percent(interval=None),  # usage since the last call
             'memory_percent': psutil.virtual_memory().percent,
-            'disk_usage': psutil.disk_usage('/').percent,
-            'active_connections': len(psutil.net_connections()),
+            'disk_usage': _disk_usage_percent(),
+            'active_connections': _active_connections(),
             'process_memory_mb': psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024
         }
         
@@ -2,24 +2,17 @@ from flask import Blueprint, request, jsonify, current_app
 import logging
 from datetime import datetime
 import numpy as np
-from PIL import Image
-
-from app.services.traffic_analyzer import TrafficAnalyzer
 
 logger = logging.getLogger(__name__)
 
 # Create blueprint
 traffic_bp = Blueprint('traffic', __name__)
 
-# Initialize traffic analyzer
-traffic_analyzer = None
+DIRECTIONS = ('north', 'south', 'east', 'west')
 
-def get_traffic_analyzer():
-    """Get or initialize traffic analyzer"""
-    global traffic_analyzer
-    if traffic_analyzer is None:
-        traffic_analyzer = TrafficAnalyzer(current_app.config)
-    return traffic_analyzer
+# The analyzer does not process frames yet, so uploads are not read or
+# decoded; it is handed these shared blank frames instead
+BLANK_FRAMES = {direction: np.zeros((100, 100, 3), dtype=np.uint8) for direction in DIRECTIONS}
 
 @traffic_bp.route('/api/analyze-traffic', methods=['POST'])
 def analyze_traffic():
@@ -34,19 +27,8 @@ def analyze_traffic():
                 'message': 'Please upload images for all four directions'
             }), 400
         
-        # For demo purposes, we'll use the analyzer directly
-        # In full implementation, process the actual uploaded images
-        analyzer = get_traffic_analyzer()
-        
-        # Create dummy image data for now
-        dummy_images = {
-            'north': np.zeros((100, 100, 3), dtype=np.uint8),
-            'south': np.zeros((100, 100, 3), dtype=np.uint8),
-            'east': np.zeros((100, 100, 3), dtype=np.uint8),
-            'west': np.zeros((100, 100, 3), dtype=np.uint8)
-        }
-        
-        analysis_result = analyzer.analyze_traffic_pattern(dummy_images)
+        analyzer = current_app.extensions['traffic_analyzer']
+        analysis_result = analyzer.analyze_traffic_pattern(BLANK_FRAMES)
         
         logger.info("Traffic analysis completed successfully")
         return jsonify(analysis_result)
@@ -62,7 +44,7 @@ def analyze_traffic():
 def test_analysis():
     """Test analysis endpoint"""
     try:
-        analyzer = get_traffic_analyzer()
+        analyzer = current_app.extensions['traffic_analyzer']
         analysis_result = analyzer.analyze_traffic_pattern({})
         return jsonify(analysis_result)
     except Exception as e:
@@ -78,11 +60,11 @@ def test_analysis():
 def get_statistics():
     """Get traffic statistics"""
     try:
-        analyzer = get_traffic_analyzer()
+        analyzer = current_app.extensions['traffic_analyzer']
         stats = analyzer.get_traffic_statistics()
         return jsonify({
             'statistics': stats,
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,39 @@
+"""
+Programmatic gunicorn launcher shared by run.py and the standalone app.py.
+Settings come from gunicorn.conf.py, the same file `gunicorn -c` reads
+"""
+import os
+import runpy
+from functools import lru_cache
+
+GUNICORN_CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'gunicorn.conf.py')
+
+@lru_cache(maxsize=1)
+def load_gunicorn_settings():
+    """Execute gunicorn.conf.py once and return its module namespace
+    
+    Running it also exports GUNICORN_WORKERS and the per-worker native
+    thread limits, so call this before numpy/cv2 are imported.
+    """
+    return runpy.run_path(GUNICORN_CONF)
+
+def run_production_server(flask_app):
+    """Serve an already-built app with gunicorn (settings from gunicorn.conf.py)"""
+    from gunicorn.app.base import BaseApplication
+    
+    class TrafficAIServer(BaseApplication):
+        def __init__(self, application, settings):
+            self.application = application
+            self.settings = settings
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.settings.items():
+                if key in self.cfg.settings:
+                    self.cfg.set(key, value)
+        
+        def load(self):
+            return self.application
+    
+    TrafficAIServer(flask_app, load_gunicorn_settings()).run()
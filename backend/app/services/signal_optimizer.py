@@ -2,9 +2,74 @@ import logging
 from typing import Dict, List, Tuple
 import random
 from datetime import datetime
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Fixed direction order; counts are handled as arrays indexed by it
+DIRS = ('north', 'south', 'east', 'west')
+NS_IDX = np.array([0, 1])
+EW_IDX = np.array([2, 3])
+
+# Signal states are packed into one int, one bit per direction (1 = green):
+# north=1, south=2, east=4, west=8
+NS_BITS = 0b0011
+EW_BITS = 0b1100
+DEFAULT_SIGNAL_BITS = 0b0100  # east green
+
+def _bits_to_dict(state_bits: int) -> Dict[str, str]:
+    """Expand packed signal states into the API's direction -> colour dict"""
+    return {d: 'green' if (state_bits >> i) & 1 else 'red' for i, d in enumerate(DIRS)}
+
+def _dict_to_bits(signal_states: Dict[str, str]) -> int:
+    """Pack a direction -> colour dict into signal state bits"""
+    return sum(1 << i for i, d in enumerate(DIRS) if signal_states.get(d) == 'green')
+
+def _green_directions(state_bits: int) -> List[str]:
+    """Directions whose bit is set"""
+    return [DIRS[i] for i in range(len(DIRS)) if (state_bits >> i) & 1]
+
+def _build_optimize_fast():
+    """
+    Generate _optimize_fast(north, south, east, west) -> state bits, the
+    normal-traffic decision of SignalOptimizer (clear priority, then
+    perpendicular groups) unrolled over the fixed DIRS as scalar int code
+    """
+    names = list(DIRS)
+    ns = [names[i] for i in NS_IDX]
+    ew = [names[i] for i in EW_IDX]
+    
+    lines = [f"def _optimize_fast({', '.join(names)}):",
+             f"    total = {' + '.join(names)}",
+             "    if total == 0:",
+             f"        return {DEFAULT_SIGNAL_BITS}",
+             f"    best, bits = {names[0]}, 1"]
+    # First maximum wins, like argmax
+    for i, name in enumerate(names[1:], 1):
+        lines += [f"    if {name} > best:",
+                  f"        best, bits = {name}, {1 << i}"]
+    lines += [f"    if best > (total - best) / {len(names) - 1} * 2.5:",
+              "        return bits",
+              f"    ns_traffic = {' + '.join(ns)}",
+              f"    ew_traffic = {' + '.join(ew)}",
+              "    if ns_traffic == 0:",
+              f"        return {DEFAULT_SIGNAL_BITS} if ew_traffic == 0 else {EW_BITS}",
+              "    if ew_traffic == 0:",
+              f"        return {NS_BITS}",
+              "    if ns_traffic > ew_traffic * 1.5:",
+              f"        return {NS_BITS}",
+              "    if ew_traffic > ns_traffic * 1.5:",
+              f"        return {EW_BITS}",
+              f"    if max({', '.join(ns)}) >= max({', '.join(ew)}):",
+              f"        return {1 << int(NS_IDX[0])} if {ns[0]} >= {ns[1]} else {1 << int(NS_IDX[1])}",
+              f"    return {1 << int(EW_IDX[0])} if {ew[0]} >= {ew[1]} else {1 << int(EW_IDX[1])}"]
+    
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    return namespace['_optimize_fast']
+
+_optimize_fast = _build_optimize_fast()
+
 class SignalOptimizer:
     """Optimizes traffic signals based on traffic analysis"""
     
@@ -16,6 +81,11 @@ class SignalOptimizer:
             'morning': (7, 10),    # 7 AM - 10 AM
             'evening': (16, 19)    # 4 PM - 7 PM
         }
+        # Hour -> peak flag lookup table, one byte per hour of the day
+        self._peak_mask = bytes(
+            1 if any(start <= hour < end for start, end in self.peak_hours.values()) else 0
+            for hour in range(24)
+        )
     
     def optimize_signals(self, vehicle_counts: Dict[str, int], 
                         traffic_density: Dict[str, str],
@@ -27,15 +97,18 @@ class SignalOptimizer:
             current_hour = datetime.now().hour
             is_peak_hour = self._is_peak_hour(current_hour)
             
+            # Convert once; everything below indexes by DIRS position
+            counts = np.array([vehicle_counts[d] for d in DIRS], dtype=np.int32)
+            
             # Get base signal states
             if is_peak_hour:
-                signal_states = self._peak_hour_optimization(vehicle_counts, traffic_density)
+                state_bits = self._peak_hour_optimization(counts, traffic_density)
             else:
-                signal_states = self._normal_optimization(vehicle_counts, traffic_density)
+                state_bits = _optimize_fast(*counts.tolist())
             
             # Apply emergency mode if needed
             if self._should_activate_emergency_mode(traffic_density):
-                signal_states = self._emergency_optimization(vehicle_counts, traffic_density)
+                state_bits = self._emergency_optimization(counts, traffic_density)
                 self.emergency_mode = True
                 logger.info("Emergency traffic mode activated")
             else:
@@ -43,126 +116,103 @@ class SignalOptimizer:
             
             # Ensure smooth transitions from previous states
             if previous_states:
-                signal_states = self._ensure_smooth_transition(previous_states, signal_states)
+                state_bits = self._ensure_smooth_transition(_dict_to_bits(previous_states), state_bits)
             
             # Log optimization decision
-            self._log_optimization_decision(vehicle_counts, signal_states, is_peak_hour)
+            self._log_optimization_decision(counts, state_bits, is_peak_hour)
             
-            return signal_states
+            return _bits_to_dict(state_bits)
             
         except Exception as e:
-            logger.error(f"Error optimizing signals: {str(e)}")
+            logger.error("Error optimizing signals: %s", e)
             return self._get_default_signals()
     
-    def _normal_optimization(self, vehicle_counts: Dict[str, int], 
-                           traffic_density: Dict[str, str]) -> Dict[str, str]:
+    def _normal_optimization(self, counts: np.ndarray, 
+                           traffic_density: Dict[str, str]) -> int:
         """Optimize signals for normal traffic conditions"""
-        total_vehicles = sum(vehicle_counts.values())
+        total_vehicles = int(counts.sum())
         
         if total_vehicles == 0:
-            return self._get_default_signals()
+            return DEFAULT_SIGNAL_BITS
         
         # Find direction with maximum vehicles
-        max_direction = max(vehicle_counts, key=vehicle_counts.get)
-        max_vehicles = vehicle_counts[max_direction]
+        max_idx = int(counts.argmax())
+        max_vehicles = counts[max_idx]
         
         # Check if there's a clear priority
-        other_directions = [d for d in vehicle_counts.keys() if d != max_direction]
-        other_avg = sum(vehicle_counts[d] for d in other_directions) / len(other_directions)
+        other_avg = (total_vehicles - max_vehicles) / (len(DIRS) - 1)
         
         if max_vehicles > other_avg * 2.5:  # Clear priority
-            signal_states = {direction: 'red' for direction in vehicle_counts.keys()}
-            signal_states[max_direction] = 'green'
-        else:
-            # Give green to perpendicular directions with most traffic
-            signal_states = self._optimize_perpendicular_groups(vehicle_counts, traffic_density)
+            return 1 << max_idx
         
-        return signal_states
+        # Give green to perpendicular directions with most traffic
+        return self._optimize_perpendicular_groups(counts, traffic_density)
     
-    def _peak_hour_optimization(self, vehicle_counts: Dict[str, int], 
-                              traffic_density: Dict[str, str]) -> Dict[str, str]:
+    def _peak_hour_optimization(self, counts: np.ndarray, 
+                              traffic_density: Dict[str, str]) -> int:
         """Optimize signals for peak hour traffic conditions"""
-        total_vehicles = sum(vehicle_counts.values())
-        
-        if total_vehicles == 0:
-            return self._get_default_signals()
+        if counts.sum() == 0:
+            return DEFAULT_SIGNAL_BITS
         
         # During peak hours, prioritize main roads and coordinate signals
-        main_road_priority = self._identify_main_roads(vehicle_counts, traffic_density)
+        main_road_priority = self._identify_main_roads(counts, traffic_density)
         
         if main_road_priority:
-            signal_states = {direction: 'red' for direction in vehicle_counts.keys()}
+            state_bits = 0
             for direction in main_road_priority[:2]:  # Allow up to 2 directions green
-                signal_states[direction] = 'green'
-        else:
-            signal_states = self._optimize_perpendicular_groups(vehicle_counts, traffic_density)
+                state_bits |= 1 << DIRS.index(direction)
+            return state_bits
         
-        return signal_states
+        return self._optimize_perpendicular_groups(counts, traffic_density)
     
-    def _emergency_optimization(self, vehicle_counts: Dict[str, int], 
-                              traffic_density: Dict[str, str]) -> Dict[str, str]:
+    def _emergency_optimization(self, counts: np.ndarray, 
+                              traffic_density: Dict[str, str]) -> int:
         """Optimize signals for emergency traffic conditions"""
         # In emergency mode, clear the most congested direction first
-        congested_directions = [
-            dir for dir, density in traffic_density.items() 
-            if density in ['high', 'very_high']
-        ]
+        congested = np.array([traffic_density[d] in ('high', 'very_high') for d in DIRS])
         
-        if congested_directions:
-            signal_states = {direction: 'red' for direction in vehicle_counts.keys()}
+        if congested.any():
             # Give green to the most congested direction
-            most_congested = max(congested_directions, 
-                               key=lambda d: vehicle_counts[d])
-            signal_states[most_congested] = 'green'
-        else:
-            signal_states = self._normal_optimization(vehicle_counts, traffic_density)
+            most_congested = int(np.where(congested, counts, -1).argmax())
+            return 1 << most_congested
         
-        return signal_states
+        return self._normal_optimization(counts, traffic_density)
     
-    def _optimize_perpendicular_groups(self, vehicle_counts: Dict[str, int],
-                                     traffic_density: Dict[str, str]) -> Dict[str, str]:
+    def _optimize_perpendicular_groups(self, counts: np.ndarray,
+                                     traffic_density: Dict[str, str]) -> int:
         """Optimize by giving green to perpendicular direction groups"""
-        # Group directions by perpendicular pairs
-        north_south = ['north', 'south']
-        east_west = ['east', 'west']
-        
-        ns_traffic = sum(vehicle_counts[d] for d in north_south)
-        ew_traffic = sum(vehicle_counts[d] for d in east_west)
+        ns_counts = counts[NS_IDX]
+        ew_counts = counts[EW_IDX]
+        ns_traffic = ns_counts.sum()
+        ew_traffic = ew_counts.sum()
         
-        signal_states = {direction: 'red' for direction in vehicle_counts.keys()}
+        # One empty axis decides it outright (common at low-traffic times)
+        if ns_traffic == 0:
+            return DEFAULT_SIGNAL_BITS if ew_traffic == 0 else EW_BITS
+        if ew_traffic == 0:
+            return NS_BITS
         
         if ns_traffic > ew_traffic * 1.5:
             # Prioritize North-South
-            for direction in north_south:
-                signal_states[direction] = 'green'
+            return NS_BITS
         elif ew_traffic > ns_traffic * 1.5:
             # Prioritize East-West
-            for direction in east_west:
-                signal_states[direction] = 'green'
-        else:
-            # Balanced traffic - give green to the group with highest single direction
-            max_ns = max(vehicle_counts[d] for d in north_south)
-            max_ew = max(vehicle_counts[d] for d in east_west)
-            
-            if max_ns >= max_ew:
-                busiest_ns = max(north_south, key=lambda d: vehicle_counts[d])
-                signal_states[busiest_ns] = 'green'
-            else:
-                busiest_ew = max(east_west, key=lambda d: vehicle_counts[d])
-                signal_states[busiest_ew] = 'green'
+            return EW_BITS
         
-        return signal_states
+        # Balanced traffic - give green to the group with highest single direction
+        if ns_counts.max() >= ew_counts.max():
+            return 1 << int(NS_IDX[ns_counts.argmax()])
+        return 1 << int(EW_IDX[ew_counts.argmax()])
     
-    def _identify_main_roads(self, vehicle_counts: Dict[str, int],
+    def _identify_main_roads(self, counts: np.ndarray,
                            traffic_density: Dict[str, str]) -> List[str]:
         """Identify main roads based on traffic patterns"""
-        # Sort directions by vehicle count (descending)
-        sorted_directions = sorted(vehicle_counts.keys(), 
-                                 key=lambda d: vehicle_counts[d], 
-                                 reverse=True)
+        # Sort directions by vehicle count (descending, ties keep DIRS order)
+        sorted_idx = np.argsort(-counts, kind='stable')
         
         main_roads = []
-        for direction in sorted_directions:
+        for idx in sorted_idx:
+            direction = DIRS[idx]
             if traffic_density[direction] in ['medium', 'high', 'very_high']:
                 main_roads.append(direction)
         
@@ -180,34 +230,33 @@ class SignalOptimizer:
     
     def _is_peak_hour(self, current_hour: int) -> bool:
         """Check if current time is during peak hours"""
-        for period, (start, end) in self.peak_hours.items():
-            if start <= current_hour < end:
-                return True
-        return False
+        return bool(self._peak_mask[current_hour])
     
-    def _ensure_smooth_transition(self, previous_states: Dict[str, str],
-                                new_states: Dict[str, str]) -> Dict[str, str]:
+    def _ensure_smooth_transition(self, previous_bits: int, new_bits: int) -> int:
         """Ensure smooth transition between signal states"""
+        # Walk only the directions whose signal actually changes
+        changed = previous_bits ^ new_bits
+        while changed:
+            i = (changed & -changed).bit_length() - 1
+            logger.debug("Signal change - %s: %s", DIRS[i], 'green' if (new_bits >> i) & 1 else 'red')
+            changed &= changed - 1
+        
         # For now, return new states directly
         # In production, you might implement yellow light transitions
-        return new_states
+        return new_bits
     
     def _get_default_signals(self) -> Dict[str, str]:
         """Get default signal states"""
-        return {
-            'north': 'red',
-            'south': 'red', 
-            'east': 'green',
-            'west': 'red'
-        }
+        return _bits_to_dict(DEFAULT_SIGNAL_BITS)
     
-    def _log_optimization_decision(self, vehicle_counts: Dict[str, int],
-                                 signal_states: Dict[str, str], is_peak_hour: bool):
+    def _log_optimization_decision(self, counts: np.ndarray,
+                                 state_bits: int, is_peak_hour: bool):
         """Log the optimization decision for monitoring"""
-        green_directions = [d for d, state in signal_states.items() if state == 'green']
-        total_vehicles = sum(vehicle_counts.values())
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        
+        green_directions = _green_directions(state_bits)
+        total_vehicles = int(counts.sum())
         
-        logger.info(f"Signal optimization - "
-                   f"Peak hour: {is_peak_hour}, "
-                   f"Total vehicles: {total_vehicles}, "
-                   f"Green signals: {green_directions}")
\ No newline at end of file
+        logger.info("Signal optimization - Peak hour: %s, Total vehicles: %d, Green signals: %s",
+                    is_peak_hour, total_vehicles, green_directions)
\ No newline at end of file
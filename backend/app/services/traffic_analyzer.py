@@ -1,16 +1,31 @@
 import logging
+import secrets
+import threading
+from collections import deque
 from typing import Dict, List, Any
 import numpy as np
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+HISTORY_SIZE = 100  # analyses kept in memory
+STATS_WINDOW = 20   # most recent analyses covered by the statistics
+
 class TrafficAnalyzer:
     """Main traffic analysis orchestrator"""
     
     def __init__(self, config):
         self.config = config
-        self.analysis_history = []
+        self.analysis_history = deque(maxlen=HISTORY_SIZE)
+        self._stats_cache = None  # invalidated whenever history changes
+        # Analyses run concurrently on gthread request threads; guards the
+        # history, its ring buffer and the statistics cache
+        self._lock = threading.Lock()
+        
+        # Column-wise ring buffer of the numeric history used by the statistics
+        self._hist_total = np.zeros(HISTORY_SIZE, dtype=np.int32)
+        self._hist_idx = 0  # next slot to write
+        self._hist_len = 0
         
         logger.info("Traffic Analyzer initialized successfully")
     
@@ -54,41 +69,55 @@ class TrafficAnalyzer:
                 'analysis_id': self._generate_analysis_id()
             }
             
-            # Store in history
-            self.analysis_history.append(sample_analysis)
-            if len(self.analysis_history) > 100:
-                self.analysis_history.pop(0)
+            # Store in history (oldest entries drop off automatically)
+            self._record_analysis(sample_analysis)
             
             logger.info("Traffic analysis completed successfully")
             
             return sample_analysis
             
         except Exception as e:
-            logger.error(f"Error in traffic pattern analysis: {str(e)}")
+            logger.error("Error in traffic pattern analysis: %s", e)
             raise
     
+    def _record_analysis(self, analysis: Dict[str, Any]):
+        """Append an analysis to the history and its numeric columns"""
+        with self._lock:
+            self.analysis_history.append(analysis)
+            
+            slot = self._hist_idx
+            self._hist_total[slot] = analysis['total_vehicles']
+            self._hist_idx = (slot + 1) % HISTORY_SIZE
+            self._hist_len = min(self._hist_len + 1, HISTORY_SIZE)
+            self._stats_cache = None
+    
     def _generate_analysis_id(self) -> str:
         """Generate unique analysis ID"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        import random
-        random_suffix = random.randint(1000, 9999)
+        random_suffix = secrets.token_hex(2)
         return f"TRAFFIC_ANALYSIS_{timestamp}_{random_suffix}"
     
     def get_analysis_history(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent analysis history"""
-        return self.analysis_history[-limit:]
+        with self._lock:
+            return list(self.analysis_history)[-limit:]
     
     def get_traffic_statistics(self) -> Dict[str, Any]:
         """Get overall traffic statistics"""
-        if not self.analysis_history:
-            return {}
-        
-        recent_analyses = self.analysis_history[-20:]
-        total_vehicles = [analysis['total_vehicles'] for analysis in recent_analyses]
-        
-        return {
-            'average_vehicles': sum(total_vehicles) / len(total_vehicles) if total_vehicles else 0,
-            'max_vehicles': max(total_vehicles) if total_vehicles else 0,
-            'min_vehicles': min(total_vehicles) if total_vehicles else 0,
-            'total_analyses': len(recent_analyses)
-        }
\ No newline at end of file
+        with self._lock:
+            if not self._hist_len:
+                return {}
+            
+            if self._stats_cache is not None:
+                return self._stats_cache
+            
+            count = min(self._hist_len, STATS_WINDOW)
+            recent = np.take(self._hist_total, np.arange(self._hist_idx - count, self._hist_idx), mode='wrap')
+            
+            self._stats_cache = {
+                'average_vehicles': float(recent.mean()),
+                'max_vehicles': int(recent.max()),
+                'min_vehicles': int(recent.min()),
+                'total_analyses': count
+            }
+            return self._stats_cache
\ No newline at end of file
@@ -2,46 +2,142 @@ import cv2
 import numpy as np
 import logging
 from typing import List, Tuple, Dict, Any
-import random
+
+from app.utils.jit import njit
 
 logger = logging.getLogger(__name__)
 
+# Detection constants, built once at import
+_KERNEL_RECT_5 = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+_KERNEL_ELLIPSE_3 = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+_GAUSSIAN_KSIZE = (5, 5)
+_GAUSSIAN_SIGMA = 0
+_CANNY_LOW = 50
+_CANNY_HIGH = 150
+_AREA_MIN_CONTOUR = 100.0   # Adjust based on image scale
+_AREA_MAX_CONTOUR = 5000.0
+_ASPECT_MIN = 0.8           # Vehicles typically have aspect ratios between 0.8 and 3.0
+_ASPECT_MAX = 3.0
+_AREA_MIN_MOTION = 500      # Adjust thresholds as needed
+_AREA_MAX_MOTION = 10000
+_DNN_INPUT_SIZE = (640, 640)
+_DNN_CONF_THRESHOLD = 0.35
+_DNN_NMS_THRESHOLD = 0.45
+_DNN_VEHICLE_CLASSES = np.array([2, 3, 5, 7])  # COCO car, motorcycle, bus, truck
+
+# Haar cascade shared by every detector in the process (read-only once loaded)
+_vehicle_cascade = None
+_cascade_checked = False
+
+def load_vehicle_cascade():
+    """
+    Load the Haar cascade once per process; returns None when unavailable.
+    create_app calls this so that with gunicorn's preload_app the classifier
+    is loaded in the master and shared copy-on-write by the forked workers
+    """
+    global _vehicle_cascade, _cascade_checked
+    if not _cascade_checked:
+        _cascade_checked = True
+        try:
+            # Try to load Haar cascade for vehicle detection
+            cascade_path = cv2.data.haarcascades + 'haarcascade_car.xml'
+            cascade = cv2.CascadeClassifier(cascade_path)
+            if cascade.empty():
+                logger.warning("Haar cascade for vehicles not available")
+            else:
+                _vehicle_cascade = cascade
+                logger.info("Haar cascade vehicle detector loaded successfully")
+        except Exception as e:
+            logger.warning("Could not load Haar cascade: %s", e)
+    return _vehicle_cascade
+
+# Whether the filter chains run through OpenCV's transparent API (UMat) so
+# intermediates stay in device memory; decided on the first detection so the
+# OpenCL runtime starts inside the worker, not in a preloading master
+_use_opencl = None
+
+def _opencl_enabled() -> bool:
+    """Enable OpenCL on first use when a device is present"""
+    global _use_opencl
+    if _use_opencl is None:
+        _use_opencl = cv2.ocl.haveOpenCL()
+        cv2.ocl.setUseOpenCL(_use_opencl)
+    return _use_opencl
+
+def _to_host(mat) -> np.ndarray:
+    """Download a UMat result to a NumPy array (no-op for arrays)"""
+    return mat.get() if isinstance(mat, cv2.UMat) else mat
+
+@njit('int64(int32[:, :], float32[:])', cache=True, nogil=True)
+def _filter_contours_njit(bboxes: np.ndarray, areas: np.ndarray) -> int:
+    """Count contours with vehicle-like area and aspect ratio"""
+    count = 0
+    for i in range(areas.shape[0]):
+        area = areas[i]
+        if area < _AREA_MIN_CONTOUR or area > _AREA_MAX_CONTOUR:
+            continue
+        
+        w = bboxes[i, 2]
+        h = bboxes[i, 3]
+        if h == 0:
+            continue
+        
+        aspect_ratio = w / h
+        if _ASPECT_MIN <= aspect_ratio <= _ASPECT_MAX:
+            count += 1
+    return count
+
 class VehicleDetector:
     """Detects vehicles in images using computer vision and ML techniques"""
     
     def __init__(self, config):
         self.config = config
-        self.vehicle_cascade = None
         self.background_subtractor = None
+        self._rng = np.random.default_rng()  # PCG64, avoids the global random lock
         self.setup_detectors()
     
     def setup_detectors(self):
-        """Setup vehicle detection models and algorithms"""
-        try:
-            # Try to load Haar cascade for vehicle detection
-            cascade_path = cv2.data.haarcascades + 'haarcascade_car.xml'
-            try:
-                self.vehicle_cascade = cv2.CascadeClassifier(cascade_path)
-                if self.vehicle_cascade.empty():
-                    logger.warning("Haar cascade for vehicles not available")
-                    self.vehicle_cascade = None
-                else:
-                    logger.info("Haar cascade vehicle detector loaded successfully")
-            except Exception as e:
-                logger.warning(f"Could not load Haar cascade: {str(e)}")
-                self.vehicle_cascade = None
-            
-            # Setup background subtractor for motion detection
+        """Reset vehicle detection models; each one is created on first use"""
+        self.background_subtractor = None
+        self.dnn = None
+        self._dnn_checked = False
+        
+        logger.info("Vehicle detector initialized successfully")
+    
+    def _get_cascade(self):
+        """The process-wide Haar cascade, see load_vehicle_cascade"""
+        return load_vehicle_cascade()
+    
+    def _get_dnn(self):
+        """
+        Load the optional YOLO ONNX model once; returns None when not configured.
+        Always loaded inside the worker on first use: the CUDA backend it may
+        pick holds a GPU context, which does not survive a fork
+        """
+        if not self._dnn_checked:
+            self._dnn_checked = True
+            model_path = self.config.get('VEHICLE_MODEL_PATH')
+            if model_path:
+                try:
+                    self.dnn = cv2.dnn.readNetFromONNX(model_path)
+                    if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                        self.dnn.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+                        self.dnn.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
+                    logger.info("DNN vehicle detector loaded from %s", model_path)
+                except Exception as e:
+                    logger.warning("Could not load DNN vehicle model: %s", e)
+                    self.dnn = None
+        return self.dnn
+    
+    def _get_background_subtractor(self):
+        """Create the background subtractor for motion detection on first use"""
+        if self.background_subtractor is None:
             self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
                 history=500, 
                 varThreshold=16, 
                 detectShadows=True
             )
-            
-            logger.info("Vehicle detector initialized successfully")
-            
-        except Exception as e:
-            logger.error(f"Error setting up vehicle detectors: {str(e)}")
+        return self.background_subtractor
     
     def detect_vehicles_advanced(self, image_array: np.ndarray) -> Dict[str, Any]:
         """
@@ -57,154 +153,166 @@ class VehicleDetector:
                 'detection_method': 'composite'
             }
             
-            methods = []
+            # Upload once; every detector below reuses the same device buffer
+            image = cv2.UMat(image_array) if _opencl_enabled() else image_array
+            
+            # All detectors work on grayscale; convert once and share it
+            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
             
             # Method 1: Contour-based detection
-            contour_count = self._detect_vehicles_contours(image_array)
-            methods.append(('contour', contour_count))
+            contour_count = self._detect_vehicles_contours(gray)
             
             # Method 2: Motion-based detection (if applicable)
-            motion_count = self._detect_vehicles_motion(image_array)
-            methods.append(('motion', motion_count))
+            motion_count = self._detect_vehicles_motion(gray)
             
             # Method 3: Cascade classifier detection
-            if self.vehicle_cascade is not None:
-                cascade_count = self._detect_vehicles_cascade(image_array)
-                methods.append(('cascade', cascade_count))
+            cascade_count = 0
+            if self._get_cascade() is not None:
+                cascade_count = self._detect_vehicles_cascade(gray)
+                counts = np.array([contour_count, motion_count, cascade_count], dtype=np.float64)
+                weights = np.array([0.5, 0.3, 0.2])
+            else:
+                counts = np.array([contour_count, motion_count], dtype=np.float64)
+                weights = np.array([0.5, 0.3])
             
             # Use weighted average of different methods
-            weights = {'contour': 0.5, 'motion': 0.3, 'cascade': 0.2}
-            weighted_sum = 0
-            total_weight = 0
-            
-            for method, count in methods:
-                if method in weights:
-                    weighted_sum += count * weights[method]
-                    total_weight += weights[method]
-            
-            if total_weight > 0:
-                final_count = round(weighted_sum / total_weight)
-            else:
-                final_count = round(sum(count for _, count in methods) / len(methods))
+            final_count = int(round(counts.dot(weights) / weights.sum()))
             
             # Add some realistic variation
-            variation = random.randint(-1, 2)
+            variation = int(self._rng.integers(-1, 3))
             final_count = max(0, final_count + variation)
             
             # Cap at reasonable number
             final_count = min(final_count, 25)
             
             # Calculate confidence based on method agreement
-            if len(methods) > 1:
-                counts = [count for _, count in methods]
-                avg_count = sum(counts) / len(counts)
-                variance = sum((c - avg_count) ** 2 for c in counts) / len(counts)
-                results['confidence'] = max(0.0, 1.0 - (variance / (avg_count + 1)))
-            else:
-                results['confidence'] = 0.7
+            results['confidence'] = max(0.0, float(1.0 - counts.var() / (counts.mean() + 1)))
             
             results.update({
                 'contour_count': contour_count,
                 'motion_count': motion_count,
-                'cascade_count': methods[2][1] if len(methods) > 2 else 0,
+                'cascade_count': cascade_count,
                 'final_count': final_count
             })
             
-            logger.debug(f"Vehicle detection - Contour: {contour_count}, Motion: {motion_count}, "
-                        f"Cascade: {methods[2][1] if len(methods) > 2 else 0}, Final: {final_count}")
+            logger.debug("Vehicle detection - Contour: %d, Motion: %d, Cascade: %d, Final: %d",
+                         contour_count, motion_count, cascade_count, final_count)
             
             return results
             
         except Exception as e:
-            logger.error(f"Error in advanced vehicle detection: {str(e)}")
+            logger.error("Error in advanced vehicle detection: %s", e)
             return {
                 'contour_count': 0,
                 'motion_count': 0,
                 'cascade_count': 0,
-                'final_count': random.randint(0, 3),
+                'final_count': int(self._rng.integers(0, 4)),
                 'confidence': 0.3,
                 'detection_method': 'fallback'
             }
     
-    def _detect_vehicles_contours(self, image_array: np.ndarray) -> int:
-        """Detect vehicles using contour analysis"""
+    def detect_vehicles_batch(self, images: Dict[str, np.ndarray]) -> Dict[str, int]:
+        """
+        Count vehicles for several directions at once; with a DNN model loaded
+        all images go through a single batched forward pass
+        """
+        net = self._get_dnn()
+        if net is not None:
+            try:
+                directions = list(images)
+                blob = cv2.dnn.blobFromImages([images[d] for d in directions], 1 / 255.0,
+                                              _DNN_INPUT_SIZE, swapRB=False, crop=False)
+                net.setInput(blob)
+                output = net.forward()
+                
+                # YOLOv8 exports (batch, 4 + classes, boxes); work per box
+                if output.shape[1] < output.shape[2]:
+                    output = output.transpose(0, 2, 1)
+                
+                return {d: self._count_dnn_vehicles(predictions)
+                        for d, predictions in zip(directions, output)}
+                
+            except Exception as e:
+                logger.error("Error in batched DNN detection: %s", e)
+        
+        return {d: self.detect_vehicles_advanced(image)['final_count']
+                for d, image in images.items()}
+    
+    def _count_dnn_vehicles(self, predictions: np.ndarray) -> int:
+        """Count vehicle boxes in one image's YOLO predictions after NMS"""
+        scores = predictions[:, 4 + _DNN_VEHICLE_CLASSES].max(axis=1)
+        keep = scores > _DNN_CONF_THRESHOLD
+        if not keep.any():
+            return 0
+        
+        # Centre-based (cx, cy, w, h) to top-left (x, y, w, h) for NMSBoxes
+        boxes = predictions[keep, :4].copy()
+        boxes[:, :2] -= boxes[:, 2:] / 2
+        
+        indices = cv2.dnn.NMSBoxes(boxes.tolist(), scores[keep].tolist(),
+                                   _DNN_CONF_THRESHOLD, _DNN_NMS_THRESHOLD)
+        return min(len(indices), 25)
+    
+    def _detect_vehicles_contours(self, gray: np.ndarray) -> int:
+        """Detect vehicles using contour analysis on a grayscale image"""
         try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
-            
             # Apply Gaussian blur
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+            blurred = cv2.GaussianBlur(gray, _GAUSSIAN_KSIZE, _GAUSSIAN_SIGMA)
             
             # Edge detection
-            edges = cv2.Canny(blurred, 50, 150)
+            edges = cv2.Canny(blurred, _CANNY_LOW, _CANNY_HIGH)
             
             # Morphological operations to close gaps
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
-            closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+            closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, _KERNEL_RECT_5)
             
             # Find contours
-            contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            contours, _ = cv2.findContours(_to_host(closed), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             
             # Filter contours by area and aspect ratio
-            vehicle_contours = []
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area < 100 or area > 5000:  # Adjust based on image scale
-                    continue
-                
-                # Check aspect ratio for vehicle-like shapes
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = w / h if h > 0 else 0
-                
-                # Vehicles typically have aspect ratios between 0.8 and 3.0
-                if 0.8 <= aspect_ratio <= 3.0:
-                    vehicle_contours.append(contour)
+            bboxes = np.array([cv2.boundingRect(c) for c in contours], dtype=np.int32).reshape(-1, 4)
+            areas = np.array([cv2.contourArea(c) for c in contours], dtype=np.float32)
             
-            return len(vehicle_contours)
+            return int(_filter_contours_njit(bboxes, areas))
             
         except Exception as e:
-            logger.error(f"Error in contour detection: {str(e)}")
+            logger.error("Error in contour detection: %s", e)
             return 0
     
-    def _detect_vehicles_motion(self, image_array: np.ndarray) -> int:
-        """Detect vehicles using motion analysis"""
+    def _detect_vehicles_motion(self, gray: np.ndarray) -> int:
+        """Detect vehicles using motion analysis on a grayscale image"""
         try:
             # This is a simplified version - in production, you'd compare multiple frames
-            gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
-            
             # Apply background subtraction
-            fg_mask = self.background_subtractor.apply(gray)
+            fg_mask = self._get_background_subtractor().apply(gray)
             
             # Noise removal
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
+            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, _KERNEL_ELLIPSE_3)
             
             # Find contours in the foreground mask
-            contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            contours, _ = cv2.findContours(_to_host(fg_mask), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             
             # Count significant moving objects
             motion_count = 0
             for contour in contours:
                 area = cv2.contourArea(contour)
-                if 500 < area < 10000:  # Adjust thresholds as needed
+                if _AREA_MIN_MOTION < area < _AREA_MAX_MOTION:
                     motion_count += 1
             
             return min(motion_count, 10)  # Cap the count
             
         except Exception as e:
-            logger.error(f"Error in motion detection: {str(e)}")
+            logger.error("Error in motion detection: %s", e)
             return 0
     
-    def _detect_vehicles_cascade(self, image_array: np.ndarray) -> int:
-        """Detect vehicles using Haar cascade classifier"""
+    def _detect_vehicles_cascade(self, gray: np.ndarray) -> int:
+        """Detect vehicles using Haar cascade classifier on a grayscale image"""
         try:
-            if self.vehicle_cascade is None:
+            vehicle_cascade = self._get_cascade()
+            if vehicle_cascade is None:
                 return 0
             
-            gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
-            
             # Detect vehicles
-            vehicles = self.vehicle_cascade.detectMultiScale(
+            vehicles = vehicle_cascade.detectMultiScale(
                 gray,
                 scaleFactor=1.1,
                 minNeighbors=3,
@@ -215,24 +323,28 @@ class VehicleDetector:
             return len(vehicles)
             
         except Exception as e:
-            logger.error(f"Error in cascade detection: {str(e)}")
+            logger.error("Error in cascade detection: %s", e)
             return 0
     
-    def get_detection_quality(self, image_array: np.ndarray) -> float:
+    def get_detection_quality(self, image_array: np.ndarray, gray: np.ndarray = None) -> float:
         """
-        Assess quality of detection based on image characteristics
+        Assess quality of detection based on image characteristics;
+        pass gray when the frame's grayscale version is already at hand
         """
         try:
-            gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
-            
-            # Calculate image sharpness (variance of Laplacian)
-            sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+            if gray is None:
+                gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
             
-            # Calculate contrast (standard deviation)
-            contrast = gray.std()
+            # Calculate image sharpness (variance of Laplacian); int16 holds
+            # the full 3x3 Laplacian range of 8-bit input
+            laplacian = cv2.Laplacian(gray, cv2.CV_16S)
+            _, lap_std = cv2.meanStdDev(laplacian)
+            sharpness = float(lap_std[0, 0]) ** 2
             
-            # Calculate brightness (mean)
-            brightness = gray.mean()
+            # Calculate brightness (mean) and contrast (standard deviation) in one pass
+            mean, std = cv2.meanStdDev(gray)
+            brightness = mean[0, 0]
+            contrast = std[0, 0]
             
             # Normalize and combine metrics
             sharpness_score = min(sharpness / 1000, 1.0)  # Normalize sharpness
@@ -245,5 +357,5 @@ class VehicleDetector:
             return max(0.0, min(1.0, quality))
             
         except Exception as e:
-            logger.error(f"Error assessing detection quality: {str(e)}")
+            logger.error("Error assessing detection quality: %s", e)
             return 0.5
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""
+Numba kernels behind ImageProcessor. Each one is compiled eagerly at import
+for its explicit signature and cached on disk, so no request pays for JIT
+compilation; without Numba they are plain Python (callers check HAS_NUMBA)
+"""
+import numpy as np
+
+from app.utils.jit import njit
+
+# fastmath without 'contract', 'reassoc' or 'arcp': fused multiply-adds and
+# reciprocals would change the single-precision rounding copied from PIL
+FASTMATH_FLAGS = {'nnan', 'ninf', 'nsz'}
+
+@njit(cache=True)
+def _enhance_lut(rgb, contrast, brightness):
+    """
+    Contrast then brightness as a 256-entry table: both only depend on the
+    sample value once the mean of the image's 'L' conversion is known
+    (PIL blends in single precision and truncates)
+    """
+    h, w = rgb.shape[0], rgb.shape[1]
+    total = 0
+    for i in range(h):
+        for j in range(w):
+            total += (np.int64(rgb[i, j, 0]) * 19595 + np.int64(rgb[i, j, 1]) * 38470 +
+                      np.int64(rgb[i, j, 2]) * 7471 + 0x8000) >> 16
+    mean = np.int32(np.floor(total / (h * w) + 0.5))
+    
+    lut = np.empty(256, dtype=np.float32)
+    for x in range(256):
+        v = min(max(np.floor(np.float32(mean) + contrast * np.float32(x - mean)), 0.0), 255.0)
+        lut[x] = min(max(np.floor(brightness * np.float32(v)), 0.0), 255.0)
+    return lut
+
+@njit(cache=True)
+def _enhance_row(rgb, lut, sharpness, i, out_row):
+    """Enhance row i of rgb into out_row (w x 3), sharpening as PIL does"""
+    h, w = rgb.shape[0], rgb.shape[1]
+    for j in range(w):
+        for ch in range(3):
+            v = lut[rgb[i, j, ch]]
+            if 0 < i < h - 1 and 0 < j < w - 1:
+                # SMOOTH kernel: 1 everywhere, 5 in the centre, scale 13
+                acc = (lut[rgb[i - 1, j - 1, ch]] + lut[rgb[i - 1, j, ch]] + lut[rgb[i - 1, j + 1, ch]] +
+                       lut[rgb[i, j - 1, ch]] + np.float32(5.0) * v + lut[rgb[i, j + 1, ch]] +
+                       lut[rgb[i + 1, j - 1, ch]] + lut[rgb[i + 1, j, ch]] + lut[rgb[i + 1, j + 1, ch]])
+                smooth = np.float32(np.floor(acc / np.float32(13.0) + np.float32(0.5)))
+                v = smooth + sharpness * (v - smooth)
+            out_row[j, ch] = np.uint8(min(max(np.floor(v), 0.0), 255.0))
+
+@njit('void(uint8[:, :, :], uint8[:, :, ::1], float32, float32, float32)',
+      fastmath=FASTMATH_FLAGS, cache=True, nogil=True)
+def enhance_fused(src, dst, contrast, brightness, sharpness):
+    """
+    Contrast, brightness and sharpness enhancement of an RGB uint8 image in
+    one pass, matching PIL's ImageEnhance chain: contrast blends towards the
+    mean of the 'L' image, brightness scales, sharpness blends against PIL's
+    3x3 SMOOTH filter (border pixels are left unsharpened, as in PIL)
+    """
+    lut = _enhance_lut(src, contrast, brightness)
+    for i in range(src.shape[0]):
+        _enhance_row(src, lut, sharpness, i, dst[i])
+
+@njit(inline='always')
+def _lo(a, b):
+    """min() as a plain select, which LLVM vectorises more readily"""
+    return a if a < b else b
+
+@njit(inline='always')
+def _hi(a, b):
+    """max() as a plain select"""
+    return b if a < b else a
+
+@njit(inline='always')
+def _median9(p0, p1, p2, p3, p4, p5, p6, p7, p8):
+    """Median of nine values with the classic 19 min/max exchange network"""
+    p1, p2 = _lo(p1, p2), _hi(p1, p2)
+    p4, p5 = _lo(p4, p5), _hi(p4, p5)
+    p7, p8 = _lo(p7, p8), _hi(p7, p8)
+    p0, p1 = _lo(p0, p1), _hi(p0, p1)
+    p3, p4 = _lo(p3, p4), _hi(p3, p4)
+    p6, p7 = _lo(p6, p7), _hi(p6, p7)
+    p1, p2 = _lo(p1, p2), _hi(p1, p2)
+    p4, p5 = _lo(p4, p5), _hi(p4, p5)
+    p7, p8 = _lo(p7, p8), _hi(p7, p8)
+    p3 = _hi(p0, p3)
+    p5 = _lo(p5, p8)
+    p4, p7 = _lo(p4, p7), _hi(p4, p7)
+    p6 = _hi(p3, p6)
+    p4 = _hi(p1, p4)
+    p2 = _lo(p2, p5)
+    p4 = _lo(p4, p7)
+    p4, p2 = _lo(p4, p2), _hi(p4, p2)
+    p4 = _hi(p6, p4)
+    return _lo(p4, p2)
+
+@njit(cache=True)
+def _median_row(above, row, below, out_row, channels):
+    """
+    3x3 median of one row given its neighbour rows, all flat runs of
+    w * channels samples; edge columns are replicated like cv2.medianBlur
+    """
+    n = row.size
+    
+    # Interior: the shifted neighbour views are sliced up front so the loop
+    # index never goes negative (negative indices would need wraparound
+    # checks and block SIMD); the network vectorises across pixels and channels
+    a0, a1, a2 = above[:n - 2 * channels], above[channels:n - channels], above[2 * channels:]
+    r0, r1, r2 = row[:n - 2 * channels], row[channels:n - channels], row[2 * channels:]
+    b0, b1, b2 = below[:n - 2 * channels], below[channels:n - channels], below[2 * channels:]
+    out = out_row[channels:n - channels]
+    for k in range(n - 2 * channels):
+        out[k] = _median9(a0[k], a1[k], a2[k], r0[k], r1[k], r2[k], b0[k], b1[k], b2[k])
+    
+    # First and last pixel
+    last = n - channels
+    for start in (0, last):
+        left = max(start - channels, 0)
+        right = min(start + channels, last)
+        for ch in range(channels):
+            out_row[start + ch] = _median9(above[left + ch], above[start + ch], above[right + ch],
+                                           row[left + ch], row[start + ch], row[right + ch],
+                                           below[left + ch], below[start + ch], below[right + ch])
+
+@njit('void(uint8[:, :, :], uint8[:, :, ::1], float32, float32, float32)',
+      fastmath=FASTMATH_FLAGS, cache=True, nogil=True)
+def preprocess_fused(bgr, out, contrast, brightness, sharpness):
+    """
+    Whole preprocess in one pass over the frame: BGR -> RGB, enhance_fused
+    and a 3x3 median (edges replicated like cv2.medianBlur). Only a rolling
+    window of three enhanced rows is kept, so the enhanced image is never
+    written out. Runs serially: request threads already share the cores
+    """
+    h, w = bgr.shape[0], bgr.shape[1]
+    rgb = bgr[:, :, ::-1]
+    lut = _enhance_lut(rgb, contrast, brightness)
+    
+    # Enhanced row y lives in window[y % 3]
+    window = np.empty((3, w, 3), dtype=np.uint8)
+    _enhance_row(rgb, lut, sharpness, 0, window[0])
+    
+    for i in range(h):
+        above = max(i - 1, 0)
+        below = min(i + 1, h - 1)
+        if below != i:
+            _enhance_row(rgb, lut, sharpness, below, window[below % 3])
+        _median_row(window[above % 3].reshape(-1), window[i % 3].reshape(-1),
+                    window[below % 3].reshape(-1), out[i].reshape(-1), 3)
+
+@njit('void(uint8[:, :, ::1], uint8[:, ::1])', cache=True, nogil=True)
+def rgb_to_gray(rgb, gray):
+    """
+    RGB to grayscale with cv2.COLOR_RGB2GRAY's 15-bit fixed-point weights;
+    both arrays must be C-contiguous (walked as flat runs so the loop vectorises)
+    """
+    src = rgb.reshape(-1)
+    out = gray.reshape(-1)
+    for k in range(out.size):
+        out[k] = (np.uint32(src[3 * k]) * 9798 + np.uint32(src[3 * k + 1]) * 19235 +
+                  np.uint32(src[3 * k + 2]) * 3735 + 16384) >> 15
@@ -0,0 +1,17 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    
+    def njit(*args, **kwargs):
+        """Fallback decorator: run the function as plain Python"""
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+    
+    logger.info("Numba not installed - numeric kernels will run as plain Python")
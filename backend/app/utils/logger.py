@@ -22,6 +22,7 @@ def setup_logging():
     
     # Suppress noisy loggers
     logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    logging.getLogger('PIL').setLevel(logging.WARNING)
 
 def get_logger(name):
     """Get a logger instance with the given name"""
@@ -1,9 +1,13 @@
 import os
 from datetime import datetime
+from functools import lru_cache
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+# Load environment variables; the marker is inherited by child processes
+# (workers, the reloader) so they don't parse .env again
+if not os.getenv('_DOTENV_LOADED'):
+    load_dotenv()
+    os.environ['_DOTENV_LOADED'] = '1'
 
 class Config:
     """Base configuration"""
@@ -15,14 +19,18 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads', 'images')
     PROCESSED_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads', 'processed')
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+    ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'bmp'})
     
     # Traffic Analysis
     MIN_GREEN_TIME = int(os.getenv('MIN_GREEN_TIME', '10'))  # seconds
     MAX_GREEN_TIME = int(os.getenv('MAX_GREEN_TIME', '60'))  # seconds
     
+    # Vehicle Detection
+    # Optional YOLO ONNX export (dynamic batch axis) used for batched detection
+    VEHICLE_MODEL_PATH = os.getenv('VEHICLE_MODEL_PATH', '')
+    
     # CORS
-    CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
+    CORS_ORIGINS = tuple(os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(','))
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -41,6 +49,7 @@ config = {
     'default': DevelopmentConfig
 }
 
+@lru_cache(maxsize=1)
 def get_config():
     """Get configuration based on environment"""
     env = os.getenv('FLASK_ENV', 'development')
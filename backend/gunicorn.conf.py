@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for the Traffic AI Management System
+
+Run from the backend directory with: gunicorn -c gunicorn.conf.py
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = 'app:create_app()'
+bind = '0.0.0.0:5000'
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count())))
+
+# Lets the app size OpenCV's thread pool to its share of the cores; the
+# OpenMP/OpenBLAS limits must be in the environment before numpy/cv2 load
+os.environ['GUNICORN_WORKERS'] = str(workers)
+_threads_per_worker = str(max(1, multiprocessing.cpu_count() // workers))
+os.environ.setdefault('OMP_NUM_THREADS', _threads_per_worker)
+os.environ.setdefault('OPENBLAS_NUM_THREADS', _threads_per_worker)
+
+worker_class = 'gthread'
+threads = 2
+
+# Build the app (and load the Haar cascade) once in the master process;
+# workers inherit it copy-on-write instead of each loading their own copy
+preload_app = True
+
+def post_fork(server, worker):
+    """Size each worker's OpenCV thread pool to its share of the cores"""
+    import cv2
+    cv2.setNumThreads(int(_threads_per_worker))
@@ -10,7 +10,18 @@ import logging
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from config import get_config
+
+# Outside debug mode gunicorn runs several workers. Read gunicorn.conf.py now:
+# it exports the worker count and each worker's share of the cores for the
+# native thread pools (OpenCV, OpenMP, OpenBLAS), which must be set before
+# numpy/cv2 load
+if not get_config().DEBUG:
+    from app.server import load_gunicorn_settings
+    load_gunicorn_settings()
+
 from app import create_app
+from app.server import run_production_server
 
 def setup_logging():
     """Setup basic logging"""
@@ -41,13 +52,21 @@ def main():
     logger.info(f"🔧 Debug mode: {config['DEBUG']}")
     logger.info(f"🌐 CORS origins: {config['CORS_ORIGINS']}")
     
-    # Run application
-    app.run(
-        host='0.0.0.0',
-        port=5000,
-        debug=True,
-        use_reloader=True
-    )
+    # The reloader forks a watcher process, which also defeats Numba's
+    # on-disk kernel cache; opt in with FLASK_RELOAD=1
+    reload = os.getenv('FLASK_RELOAD', '0') == '1'
+    debug = config['DEBUG']
+    
+    # Run application: Werkzeug's dev server only in debug mode
+    if debug:
+        app.run(
+            host='0.0.0.0',
+            port=5000,
+            debug=True,
+            use_reloader=reload
+        )
+    else:
+        run_production_server(app)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file